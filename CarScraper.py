@@ -1,76 +1,191 @@
 import asyncio
-import nest_asyncio
-import re
-import json
+import csv
+from pathlib import Path
+from urllib.parse import urljoin, urlsplit
 from playwright.async_api import async_playwright  # Playwright async API for browser automation
-from DetailsScraper import DetailsScraping  # Custom scraper for extracting car details
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
+from DetailsScraper import DetailsScraping, CHROMIUM_ARGS, goto  # Custom scraper for extracting car details
+
+# Resource types that are never needed to read brand anchors and text
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font", "stylesheet"}
+
+
+# Route handler that aborts heavy resources and lets everything else through
+async def block_heavy_resources(route):
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
 
 # Define the CarScraper class
 class CarScraper:
-    def __init__(self, url):
+    def __init__(self, url, drive_saver=None):
         self.url = url  # URL of the main page containing all car brands
-        self.data = []  # List to store scraped brand and car data
+        self.drive_saver = drive_saver  # Optional SavingOnDrive used to upload brand outputs as they finish
+        self.data = []  # List of scraped brands and the CSV file holding each brand's cars
+        self.output_dir = Path("temp_files")  # Directory the per-brand CSV files are written to
+        self.max_concurrent_brands = 8  # Max number of brand pages scraped at once
+        self.brands_per_context = 25  # Brands scraped before the browser context is recycled
 
     # Asynchronous method to scrape brands and their associated car details
     async def scrape_brands_and_types(self):
         # Start Playwright context
         async with async_playwright() as p:
             # Launch headless Chromium browser
-            browser = await p.chromium.launch(headless=True)
+            browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
             # Open a new page
             page = await browser.new_page()
             # Navigate to the given URL
-            await page.goto(self.url)
+            await goto(page, self.url)
 
-            # Select all brand elements (anchor tags inside the brand container)
-            brand_elements = await page.query_selector_all('.styles_itemWrapper__MTzPB a')
+            # Read every brand's title and link in a single round-trip to the browser
+            brand_elements = await page.evaluate(
+                """() => Array.from(document.querySelectorAll('.styles_itemWrapper__MTzPB a'))
+                    .map(a => ({title: a.getAttribute('title'), href: a.getAttribute('href')}))"""
+            )
 
             # If no brands are found, log it and return empty data
             if not brand_elements:
                 print(f"No brand elements found on {self.url}")
                 return self.data
 
-            # Loop over each brand element
+            # Construct base URL (protocol + domain) from the input URL once
+            parsed_url = urlsplit(self.url)
+            base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+
+            # Resolve every brand's title and full link before scraping
+            items = []
             for element in brand_elements:
-                # Extract the title of the brand (e.g., Toyota, BMW)
-                title = await element.get_attribute('title')
-                # Extract the relative or absolute link to the brand page
-                brand_link = await element.get_attribute('href')
+                # Title of the brand (e.g., Toyota, BMW)
+                title = element['title']
+                # Relative or absolute link to the brand page
+                brand_link = element['href']
 
                 if brand_link:
-                    # Construct base URL (protocol + domain) from the input URL
-                    base_url = self.url.split('/', 3)[0] + '//' + self.url.split('/', 3)[2]
-                    # Construct full link: prepend base_url if it's a relative link
-                    full_brand_link = base_url + brand_link if brand_link.startswith('/') else brand_link
-
-                    # Print the complete brand link for debugging
-                    print(f"Full brand link: {full_brand_link}")
-
-                    # Open a new browser page to access brand-specific cars
-                    new_page = await browser.new_page()
-                    await new_page.goto(full_brand_link)
-
-                    # Create an instance of the DetailsScraping class to extract car info
-                    details_scraper = DetailsScraping(full_brand_link)
-                    # Get detailed car data from the brand page
-                    car_details = await details_scraper.get_car_details()
-                    # Close the temporary brand page
-                    await new_page.close()
-
-                    # Store the extracted information in the data list
-                    self.data.append({
-                        'brand_title': title,  # Brand name
-                        'brand_link': full_brand_link.rsplit('/', 1)[0] + '/{}',  # Link template for pagination
-                        'available_cars': car_details,  # List of car details scraped
-                    })
-
-                    # Log the brand and link found
-                    print(f"Found brand: {title}, Link: {full_brand_link}")
+                    # Construct full link: resolves relative, protocol-relative and absolute links
+                    full_brand_link = urljoin(base_url + '/', brand_link)
+                    items.append((title, full_brand_link))
+
+            # Close the listing page, the brand pages use their own contexts
+            await page.close()
+
+            # Scrape the brand pages concurrently, bounded by the semaphore.
+            # A fresh browser context is used for every batch of brands and closed afterwards,
+            # which is the only reliable way to release the memory Playwright keeps per page.
+            # Finished brands are handed to a background uploader through a queue, so uploads
+            # overlap with the scraping of the remaining brands.
+            semaphore = asyncio.Semaphore(self.max_concurrent_brands)
+            upload_queue = asyncio.Queue()
+            uploader = asyncio.create_task(self._uploader(upload_queue))
+            results = []
+            try:
+                for i in range(0, len(items), self.brands_per_context):
+                    batch = items[i:i + self.brands_per_context]
+                    context = await browser.new_context()
+                    # The route handler is registered per context so it is dropped with each rotation
+                    await context.route("**/*", block_heavy_resources)
+                    try:
+                        tasks = [self._scrape_with_semaphore(semaphore, context, upload_queue, title, link)
+                                 for title, link in batch]
+                        results.extend(await asyncio.gather(*tasks, return_exceptions=True))
+                    finally:
+                        await context.close()
+            finally:
+                # Sentinel: let the uploader drain the queue and stop
+                await upload_queue.put(None)
+                await uploader
+
+            # Keep the results in the original brand order, logging any failed brand
+            for (title, full_brand_link), result in zip(items, results):
+                if isinstance(result, Exception):
+                    print(f"Error scraping brand {title} ({full_brand_link}): {result}")
+                    continue
+                self.data.append(result)
 
             # Close the browser after scraping is done
             await browser.close()
         
         # Return the collected data
         return self.data
+
+    # Runs a single brand scrape once a semaphore slot is available
+    async def _scrape_with_semaphore(self, semaphore, context, upload_queue, title, full_brand_link):
+        async with semaphore:
+            return await self._scrape_one_brand(context, upload_queue, title, full_brand_link)
+
+    # Uploads the outputs of finished brands until the None sentinel is received
+    async def _uploader(self, upload_queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            brand = await upload_queue.get()
+            if brand is None:
+                break
+            path = brand.get('path')
+            if not path or not self.drive_saver:
+                continue
+            try:
+                # The Drive client is blocking, so the upload runs in the default thread pool
+                await loop.run_in_executor(None, self.drive_saver.save_files, [path])
+            except Exception as e:
+                print(f"Error uploading {path} for brand {brand['brand_title']}: {e}")
+
+    # Scrapes the cars of a single brand on its own page
+    async def _scrape_one_brand(self, context, upload_queue, title, full_brand_link):
+        # Print the complete brand link for debugging
+        print(f"Full brand link: {full_brand_link}")
+
+        # Open a new browser page to access brand-specific cars
+        new_page = await context.new_page()
+        try:
+            await goto(new_page, full_brand_link)
+
+            # Create an instance of the DetailsScraping class to extract car info
+            details_scraper = DetailsScraping(full_brand_link, context=context)
+            # Get detailed car data from the brand page
+            car_details = await details_scraper.get_car_details()
+        finally:
+            # Always close the temporary brand page to bound memory
+            await new_page.close()
+
+        # Log the brand and link found
+        print(f"Found brand: {title}, Link: {full_brand_link}")
+
+        # Write the brand's cars to disk right away so only the file path stays in memory
+        path = await asyncio.to_thread(self._write_brand_csv, title, full_brand_link, car_details)
+
+        # Extracted information for this brand
+        brand = {
+            'brand_title': title,  # Brand name
+            'brand_link': full_brand_link.rsplit('/', 1)[0] + '/{}',  # Link template for pagination
+            'path': path,  # CSV file with the car details scraped (None if no cars were found)
+        }
+
+        # Hand the finished brand to the uploader and return it
+        await upload_queue.put(brand)
+        return brand
+
+    # Returns the brand's slug from its link, e.g. "toyota" for .../automotive/cars/toyota/1
+    @staticmethod
+    def brand_slug(link):
+        segments = [segment for segment in urlsplit(link).path.split('/') if segment]
+        if segments and segments[-1].isdigit():
+            segments.pop()  # Drop the page number
+        return segments[-1] if segments else 'brand'
+
+    # Writes a brand's cars to its own CSV file and returns the file path
+    def _write_brand_csv(self, title, link, car_details):
+        if not car_details:
+            return None
+
+        self.output_dir.mkdir(exist_ok=True)
+        # Title plus link slug, so brands sharing a title (or with none) do not overwrite each other's file
+        name = f"{title}_{self.brand_slug(link)}" if title else self.brand_slug(link)
+        file_name = name.replace('/', '-').replace('\\', '-')
+        path = self.output_dir / f"{file_name}.csv"
+
+        # utf-8-sig lets Excel detect the encoding of the Arabic text
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.DictWriter(f, fieldnames=list(car_details[0].keys()))
+            writer.writeheader()
+            writer.writerows(car_details)
+        return str(path)
@@ -5,81 +5,149 @@ import nest_asyncio
 import re
 import json
 from playwright.async_api import async_playwright
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 # Allow nested event loops (useful in Jupyter)
 nest_asyncio.apply()
 
+# Chromium flags that turn off GPU, sandbox/zygote and background subsystems to keep renderer memory low
+CHROMIUM_ARGS = [
+    "--no-zygote",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-accelerated-2d-canvas",
+    "--disable-webgl",
+    "--disable-mipmap-generation",
+    "--disable-partial-raster",
+    "--no-first-run",
+    "--disable-background-networking",
+    "--disable-extensions",
+]
+
+# Navigation timeout in milliseconds, shared by every scraper
+NAVIGATION_TIMEOUT = 15000
+
+# Navigates without waiting for late ads/analytics and returns the navigation response.
+# On timeout it continues with whatever DOM is present and returns None, unless tolerate_timeout is
+# False (for pages with no selector wait to fall back on), in which case the timeout is raised.
+async def goto(page, url, timeout=NAVIGATION_TIMEOUT, tolerate_timeout=True):
+    try:
+        return await page.goto(url, wait_until="domcontentloaded", timeout=timeout)
+    except PlaywrightTimeoutError:
+        if not tolerate_timeout:
+            raise
+        print(f"Navigation to {url} timed out, continuing with the loaded DOM")
+        return None
+
+# HTTP statuses that mean the site is throttling or overloaded, so the page is retried only after a delay
+THROTTLE_STATUSES = {429, 500, 502, 503, 504}
+
 class DetailsScraping:
-    def __init__(self, url, retries=3):
+    def __init__(self, url, retries=3, context=None, defer_throttling=False):
         self.url = url
+        self.context = context  # Optional shared Playwright BrowserContext; get_car_details launches its own otherwise
         self.retries = retries  # Retry count for robustness
+        self.defer_throttling = defer_throttling  # Return right away when throttled, leaving the backoff to the caller
+        self.throttle_delay = 5  # Seconds to wait before retrying a throttled page when the site sends no Retry-After
+        self.status = None  # HTTP status of the last listing page navigation (None if unknown)
+        self.retry_after = None  # Retry-After header of the last listing page navigation, if any
 
     async def get_car_details(self):
+        if self.context is not None:
+            # Open the pages in the caller's context instead of launching a browser
+            return await self.scrape_listing(self.context)
+
         async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
+            browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+            try:
+                # One context for the listing and every car page, so the detail pages reuse its connections
+                self.context = await browser.new_context()
+                return await self.scrape_listing(self.context)
+            finally:
+                self.context = None
+                await browser.close()
+
+    # Scrapes the listing page, opening its pages from `browser` (a Browser or a BrowserContext)
+    async def scrape_listing(self, browser):
+        cars = []  # To store scraped cars
+
+        for attempt in range(self.retries):
+            # Open a fresh page for every attempt
             page = await browser.new_page()
 
             # Set timeouts
             page.set_default_navigation_timeout(30000)
             page.set_default_timeout(30000)  # General timeout
 
-            cars = []  # To store scraped cars
-
-            for attempt in range(self.retries):
-                try:
-                    # Navigate to the page
-                    await page.goto(self.url, wait_until="domcontentloaded")
-                    await page.wait_for_selector('.StackedCard_card__Kvggc', timeout=30000)
-
-                    # Extract car details
-                    car_cards = await page.query_selector_all('.StackedCard_card__Kvggc')
-                    for card in car_cards:
-                        # Extract car information
-                        link = await self.scrape_link(card)
-                        car_type = await self.scrape_car_type(card)
-                        title = await self.scrape_title(card)
-                        pinned_today = await self.scrape_pinned_today(card)
-
-                        # Scrape scrape_more_details from the car page
-                        scrape_more_details = await self.scrape_more_details(link)
-
-                        cars.append({
-                            'id': scrape_more_details.get('id'),
-                            'date_published': scrape_more_details.get('date_published'),
-                            'relative_date': scrape_more_details.get('relative_date'),
-                            'pin': pinned_today,
-                            'type': car_type,
-                            'title': title,
-                            'description': scrape_more_details.get('description'),
-                            'link': link,
-                            'image': scrape_more_details.get('image'),
-                            'price': scrape_more_details.get('price'),
-                            'address': scrape_more_details.get('address'),
-                            'additional_details': scrape_more_details.get('additional_details'),
-                            'specifications': scrape_more_details.get('specifications'),
-                            'views_no': scrape_more_details.get('views_no'),  # Added views number here
-                            'submitter': scrape_more_details.get('submitter'),
-                            'ads': scrape_more_details.get('ads'),
-                            'membership': scrape_more_details.get('membership'),
-                            'phone': scrape_more_details.get('phone'),
-                        })
-                    break  # Exit loop if successful
-
-                except Exception as e:
-                    print(f"Attempt {attempt + 1} failed for {self.url}: {e}")
-                    if attempt + 1 == self.retries:
-                        print(f"Max retries reached for {self.url}. Returning partial results.")
+            try:
+                # Navigate to the page
+                response = await goto(page, self.url)
+                self.status = response.status if response else None
+                self.retry_after = response.headers.get('retry-after') if response else None
+                if self.status == 404:
+                    # The page does not exist, retrying will not help
+                    print(f"Page not found: {self.url}")
+                    break
+                if self.status in THROTTLE_STATUSES:
+                    if self.defer_throttling or attempt + 1 == self.retries:
+                        # Throttled, leave the backoff to the caller (or give up on the last attempt)
+                        print(f"Throttled ({self.status}) on {self.url}")
                         break
-                finally:
-                    # Close page between attempts to ensure proper cleanup
-                    await page.close()
-                    if attempt + 1 < self.retries:
-                        page = await browser.new_page()
+                    # Wait as long as the site asks before the next attempt
+                    retry_after = self.retry_after
+                    delay = int(retry_after) if retry_after and retry_after.isdigit() else self.throttle_delay
+                    print(f"Throttled ({self.status}) on {self.url}, retrying in {delay}s")
+                    await asyncio.sleep(delay)
+                    continue
+                await page.wait_for_selector('.StackedCard_card__Kvggc', timeout=30000)
+
+                # Extract car details
+                car_cards = await page.query_selector_all('.StackedCard_card__Kvggc')
+                for card in car_cards:
+                    # Extract car information
+                    link = await self.scrape_link(card)
+                    car_type = await self.scrape_car_type(card)
+                    title = await self.scrape_title(card)
+                    pinned_today = await self.scrape_pinned_today(card)
+
+                    # Scrape scrape_more_details from the car page
+                    scrape_more_details = await self.scrape_more_details(link)
+
+                    cars.append({
+                        'id': scrape_more_details.get('id'),
+                        'date_published': scrape_more_details.get('date_published'),
+                        'relative_date': scrape_more_details.get('relative_date'),
+                        'pin': pinned_today,
+                        'type': car_type,
+                        'title': title,
+                        'description': scrape_more_details.get('description'),
+                        'link': link,
+                        'image': scrape_more_details.get('image'),
+                        'price': scrape_more_details.get('price'),
+                        'address': scrape_more_details.get('address'),
+                        'additional_details': scrape_more_details.get('additional_details'),
+                        'specifications': scrape_more_details.get('specifications'),
+                        'views_no': scrape_more_details.get('views_no'),  # Added views number here
+                        'submitter': scrape_more_details.get('submitter'),
+                        'ads': scrape_more_details.get('ads'),
+                        'membership': scrape_more_details.get('membership'),
+                        'phone': scrape_more_details.get('phone'),
+                    })
+                break  # Exit loop if successful
 
-            await browser.close()
-            return cars
+            except Exception as e:
+                print(f"Attempt {attempt + 1} failed for {self.url}: {e}")
+                if attempt + 1 == self.retries:
+                    print(f"Max retries reached for {self.url}. Returning partial results.")
+                    break
+            finally:
+                # Close page between attempts to ensure proper cleanup (it may live in a shared context)
+                await page.close()
+
+        return cars
 
     # Method to scrape the link
     async def scrape_link(self, card):
@@ -369,47 +437,22 @@ class DetailsScraping:
         retries = 3  # Number of retries for robustness
         for attempt in range(retries):
             try:
-                # Create a new page for this car detail scraping
+                if self.context is not None:
+                    # Create a new page for this car detail scraping in the shared context
+                    page = await self.context.new_page()
+                    try:
+                        return await self.scrape_details_page(page, url)
+                    finally:
+                        await page.close()
+
+                # Called outside get_car_details: launch a browser just for this car page
                 async with async_playwright() as p:
-                    browser = await p.chromium.launch(headless=True)
-                    page = await browser.new_page()
-
-                    await page.goto(url, wait_until="domcontentloaded", timeout=60000)  # Increased timeout
-
-                    # Extract details using helper methods
-                    id = await self.scrape_id(page)
-                    description = await self.scrape_description(page)
-                    image = await self.scrape_image(page)
-                    price = await self.scrape_price(page)
-                    address = await self.scrape_address(page)
-                    additional_details = await self.scrape_additionalDetails_list(page)
-                    specifications = await self.scrape_specifications(page)
-                    views_no = await self.scrape_views_no(page)
-                    submitter_details = await self.scrape_submitter_details(page)
-                    phone = await self.scrape_phone_number(page)
-                    relative_date = await self.scrape_relative_date(page)
-                    date_published = await self.scrape_publish_date(relative_date) if relative_date else None
-
-                    # Consolidate details into a dictionary
-                    details = {
-                        'id': id,
-                        'description': description,
-                        'image': image,
-                        'price': price,
-                        'address': address,
-                        'additional_details': additional_details,
-                        'specifications': specifications,
-                        'views_no': views_no,
-                        'submitter': submitter_details.get('submitter'),
-                        'ads': submitter_details.get('ads'),
-                        'membership': submitter_details.get('membership'),
-                        'phone': phone,
-                        'relative_date': relative_date,
-                        'date_published': date_published,
-                    }
-
-                    await browser.close()
-                    return details
+                    browser = await p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+                    try:
+                        page = await browser.new_page()
+                        return await self.scrape_details_page(page, url)
+                    finally:
+                        await browser.close()
 
             except Exception as e:
                 print(f"Error while scraping more details from {url}: {e}")
@@ -419,3 +462,40 @@ class DetailsScraping:
 
         return {}
 
+    # Navigates a page to a car's URL and extracts its details
+    async def scrape_details_page(self, page, url):
+        # Unlike the listing page there is no selector wait to fall back on, so a timeout raises and
+        # scrape_more_details retries instead of extracting from an empty DOM
+        await goto(page, url, tolerate_timeout=False)
+
+        # Extract details using helper methods
+        id = await self.scrape_id(page)
+        description = await self.scrape_description(page)
+        image = await self.scrape_image(page)
+        price = await self.scrape_price(page)
+        address = await self.scrape_address(page)
+        additional_details = await self.scrape_additionalDetails_list(page)
+        specifications = await self.scrape_specifications(page)
+        views_no = await self.scrape_views_no(page)
+        submitter_details = await self.scrape_submitter_details(page)
+        phone = await self.scrape_phone_number(page)
+        relative_date = await self.scrape_relative_date(page)
+        date_published = await self.scrape_publish_date(relative_date) if relative_date else None
+
+        # Consolidate details into a dictionary
+        return {
+            'id': id,
+            'description': description,
+            'image': image,
+            'price': price,
+            'address': address,
+            'additional_details': additional_details,
+            'specifications': specifications,
+            'views_no': views_no,
+            'submitter': submitter_details.get('submitter'),
+            'ads': submitter_details.get('ads'),
+            'membership': submitter_details.get('membership'),
+            'phone': phone,
+            'relative_date': relative_date,
+            'date_published': date_published,
+        }
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+
+# Token-bucket rate limiter whose rate adapts to how the site responds:
+# it halves on throttling (429/5xx) and grows back by one request per period on success.
+class AdaptiveRateLimiter:
+    def __init__(self, max_rate: float = 10, time_period: float = 1, min_rate: float = 0.5):
+        self.max_rate = max_rate  # Highest number of requests allowed per time period
+        self.min_rate = min_rate  # Lowest rate the limiter backs off to
+        self.time_period = time_period  # Length of the rate window in seconds
+        self.rate = max_rate  # Current number of requests allowed per time period
+        self._tokens = max_rate  # Requests that can start right now
+        self._last_refill = time.monotonic()  # When tokens were last added
+        self._lock = asyncio.Lock()  # Hands out tokens to waiters in arrival order
+
+    # Waits until a request token is available and takes it
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                # Sleep just long enough for the missing fraction of a token to refill
+                await asyncio.sleep((1 - self._tokens) * self.time_period / self.rate)
+
+    # Most tokens the bucket holds: the current rate, but never less than one whole request
+    @property
+    def capacity(self) -> float:
+        return max(1, self.rate)
+
+    # Adds the tokens accumulated since the last refill, capped at the bucket capacity
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_refill) * self.rate / self.time_period)
+        self._last_refill = now
+
+    # The site answered normally: grow the rate back towards the maximum
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + 1)
+
+    # The site pushed back: halve the rate and drop tokens above the new capacity
+    def on_throttled(self):
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, self.capacity)
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
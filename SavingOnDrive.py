@@ -1,97 +1,241 @@
+import io
 import os
+import gzip
 import json
 import logging
+import random
+import mimetypes
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload
 from datetime import datetime, timedelta
 from googleapiclient.errors import HttpError
 
+# Module logger; handlers are configured once by the application, not per instance
+logger = logging.getLogger(__name__)
+
+# Text outputs that compress well enough to be worth gzipping before upload
+COMPRESSIBLE_SUFFIXES = ('.csv', '.json', '.txt')
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Drive query that finds a (non-trashed) folder by name under a parent folder
+FOLDER_QUERY_TEMPLATE = ("name='{name}' and "
+                         "'{parent}' in parents and "
+                         "mimeType='application/vnd.google-apps.folder' and "
+                         "trashed=false")
+
+# Escapes a value for use inside a single-quoted Drive query string
+def escape_query_value(value):
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+# Builds the service account credentials and Drive client once per credentials/scopes pair.
+# Building a client parses the whole Drive discovery document, so it is shared by every
+# SavingOnDrive instance that authenticates with the same credentials.
+@functools.lru_cache(maxsize=4)
+def _build_service(credentials_json, scopes):
+    credentials = Credentials.from_service_account_info(json.loads(credentials_json), scopes=list(scopes))
+    service = build('drive', 'v3', credentials=credentials, cache_discovery=False)
+    return credentials, service
+
 # This class handles authentication and uploading files to multiple folders in Google Drive.
 class SavingOnDrive:
-    def __init__(self, credentials_dict):
+    def __init__(self, credentials_dict, parent_folder_ids):
         # Initializes with the credentials dictionary and sets up necessary variables
         self.credentials_dict = credentials_dict
+        self.parent_folder_ids = list(parent_folder_ids)  # Google Drive parent folder IDs to upload into
         self.scopes = ['https://www.googleapis.com/auth/drive']  # Permission scope to access Google Drive
         self.service = None  # Will hold the authenticated service client
-
-        # List of Google Drive parent folder IDs to upload into
-        self.parent_folder_ids = [
-            '1PBrE4Qfage1WgcS_rRjNpO7hW50emOaT',  # Confirmed working folder
-            '1mLRdYvZb56LS10M0hjpzYTVrQiyWGN7m'   # Folder with known upload issues
-        ]
-        self.setup_logging()  # Initialize logging configuration
-
-    def setup_logging(self):
-        """Configure logging."""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),                 # Print logs to console
-                logging.FileHandler("drive_upload.log")  # Save logs to file
-            ]
-        )
+        self.credentials = None  # Service account credentials, shared by the per-thread clients
+        self._local = threading.local()  # Per-thread service clients (httplib2 is not thread-safe)
+        self.max_upload_workers = 4  # Parallel uploads, kept low to stay under Drive's write quota
+        self._upload_executor = None  # Upload threads kept for the life of the instance, so their clients are reused
+        self._executor_lock = threading.Lock()  # Guards the lazy creation of the upload executor
+        self.upload_chunk_size = 10 * 1024 * 1024  # Bytes sent per resumable upload request
+        self.resumable_threshold = 5 * 1024 * 1024  # Smaller files use a single multipart request
+        self.gzip_text_uploads = True  # Upload text outputs as .gz to cut upload bytes
+        self.max_api_attempts = 6  # Attempts per Drive call on rate limiting/transient errors
+        self.backoff_max_delay = 32  # Upper bound in seconds for the exponential backoff delay
+        self._folder_cache = {}  # (parent folder ID, folder name) -> folder ID resolved in this process
 
     def authenticate(self):
         """Authenticate with Google Drive API."""
         try:
-            # Authenticate using the provided service account credentials
-            creds = Credentials.from_service_account_info(self.credentials_dict, scopes=self.scopes)
-            # Build a Google Drive API client
-            self.service = build('drive', 'v3', credentials=creds)
-            logging.info("Successfully authenticated with Google Drive.")
+            # Authenticate using the provided service account credentials and build (or reuse) a
+            # Google Drive API client for the authenticating thread
+            credentials_json = json.dumps(self.credentials_dict, sort_keys=True)
+            self.credentials, self.service = _build_service(credentials_json, tuple(self.scopes))
+            self._local.service = self.service
+            logger.info("Successfully authenticated with Google Drive.")
         except Exception as e:
             # Log and raise any errors encountered during authentication
-            logging.error(f"Authentication error: {e}")
+            logger.error(f"Authentication error: {e}")
             raise
 
+    def get_service(self):
+        """Return the Drive client of the current thread, building one on first use."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = build('drive', 'v3', credentials=self.credentials, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def get_upload_executor(self):
+        """Return the shared upload thread pool, creating it on first use."""
+        with self._executor_lock:
+            if self._upload_executor is None:
+                self._upload_executor = ThreadPoolExecutor(max_workers=self.max_upload_workers,
+                                                           thread_name_prefix='drive-upload')
+            return self._upload_executor
+
+    def execute_with_backoff(self, request):
+        """Execute a Drive request, retrying rate limiting and transient errors with exponential backoff."""
+        for attempt in range(self.max_api_attempts):
+            try:
+                return request.execute()
+            except HttpError as e:
+                if e.resp.status not in RETRYABLE_STATUSES or attempt + 1 == self.max_api_attempts:
+                    raise
+                # Honour the server's Retry-After (in seconds) if present, else back off 1s, 2s, 4s... with jitter
+                retry_after = e.resp.get('retry-after')
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+                else:
+                    delay = min(2 ** attempt, self.backoff_max_delay) + random.uniform(0, 1)
+                logger.warning(f"Drive request failed with {e.resp.status}, retrying in {delay:.1f}s "
+                               f"(attempt {attempt + 1} of {self.max_api_attempts}).")
+                time.sleep(delay)
+
+    def list_folder_request(self, folder_name, parent_folder_id):
+        """Build the request that looks up a folder by name under a parent."""
+        # Query to check if folder already exists under the given parent
+        query = FOLDER_QUERY_TEMPLATE.format(name=escape_query_value(folder_name),
+                                             parent=escape_query_value(parent_folder_id))
+        return self.get_service().files().list(
+            q=query,
+            spaces='drive',
+            fields='files(id, name)'
+        )
+
+    def create_folder_request(self, folder_name, parent_folder_id):
+        """Build the request that creates a folder under a parent."""
+        folder_metadata = {
+            'name': folder_name,
+            'mimeType': 'application/vnd.google-apps.folder',
+            'parents': [parent_folder_id]
+        }
+        return self.get_service().files().create(body=folder_metadata, fields='id')
+
     def get_or_create_folder(self, folder_name, parent_folder_id):
         """Retrieve folder ID if it exists, otherwise create a new folder."""
+        # Reuse a folder already resolved by an earlier call
+        cache_key = (parent_folder_id, folder_name)
+        if cache_key in self._folder_cache:
+            return self._folder_cache[cache_key]
+
         try:
-            # Query to check if folder already exists under the given parent
-            query = (f"name='{folder_name}' and "
-                     f"'{parent_folder_id}' in parents and "
-                     f"mimeType='application/vnd.google-apps.folder' and "
-                     f"trashed=false")
-            
             # Execute the query
-            results = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name)'
-            ).execute()
+            results = self.execute_with_backoff(self.list_folder_request(folder_name, parent_folder_id))
             
             folders = results.get('files', [])
             if folders:
                 # Return the ID of the first matching folder
+                self._folder_cache[cache_key] = folders[0]['id']
                 return folders[0]['id']
             
-            # Folder does not exist, so create a new one
-            folder_metadata = {
-                'name': folder_name,
-                'mimeType': 'application/vnd.google-apps.folder',
-                'parents': [parent_folder_id]
-            }
-            # Create the folder and return its ID
-            folder = self.service.files().create(body=folder_metadata, fields='id').execute()
-            logging.info(f"Created new folder: {folder_name} (ID: {folder['id']})")
+            # Folder does not exist, so create a new one and return its ID
+            folder = self.execute_with_backoff(self.create_folder_request(folder_name, parent_folder_id))
+            logger.info(f"Created new folder: {folder_name} (ID: {folder['id']})")
+            self._folder_cache[cache_key] = folder['id']
             return folder['id']
         except HttpError as e:
             # Specific handling if parent folder doesn't exist
             if e.resp.status == 404:
-                logging.error(f"Parent folder not found (ID: {parent_folder_id}). Skipping this folder.")
+                logger.error(f"Parent folder not found (ID: {parent_folder_id}). Skipping this folder.")
                 return None
             # General error logging
-            logging.error(f"Error getting/creating folder: {e}")
+            logger.error(f"Error getting/creating folder: {e}")
             raise
 
+    def get_or_create_folders(self, folder_name, parent_folder_ids):
+        """Retrieve or create a folder under every parent, batching the metadata requests."""
+        folder_ids = {}  # parent folder ID -> folder ID (None if the parent is missing)
+        errors = {}  # parent folder ID -> exception raised by its batched request
+
+        def on_list(parent_folder_id, response, exception):
+            # Record the first matching folder, if any
+            if exception is not None:
+                errors[parent_folder_id] = exception
+            elif response.get('files'):
+                folder_ids[parent_folder_id] = response['files'][0]['id']
+
+        def on_create(parent_folder_id, response, exception):
+            # Record the newly created folder
+            if exception is not None:
+                errors[parent_folder_id] = exception
+            else:
+                folder_ids[parent_folder_id] = response['id']
+                logger.info(f"Created new folder: {folder_name} (ID: {response['id']})")
+
+        # Reuse folders already resolved by an earlier call
+        for parent_folder_id in parent_folder_ids:
+            if (parent_folder_id, folder_name) in self._folder_cache:
+                folder_ids[parent_folder_id] = self._folder_cache[(parent_folder_id, folder_name)]
+
+        # First batch: look the folder up under every remaining parent in a single HTTP round-trip
+        unresolved = [parent_folder_id for parent_folder_id in parent_folder_ids if parent_folder_id not in folder_ids]
+        if unresolved:
+            batch = self.get_service().new_batch_http_request(callback=on_list)
+            for parent_folder_id in unresolved:
+                batch.add(self.list_folder_request(folder_name, parent_folder_id), request_id=parent_folder_id)
+            self.execute_with_backoff(batch)
+            self._handle_folder_errors(folder_name, errors, folder_ids)
+
+        # Second batch: create the folder under the parents where it does not exist yet
+        missing = [parent_folder_id for parent_folder_id in parent_folder_ids if parent_folder_id not in folder_ids]
+        if missing:
+            batch = self.get_service().new_batch_http_request(callback=on_create)
+            for parent_folder_id in missing:
+                batch.add(self.create_folder_request(folder_name, parent_folder_id), request_id=parent_folder_id)
+            self.execute_with_backoff(batch)
+            self._handle_folder_errors(folder_name, errors, folder_ids)
+
+        # Remember the resolved folders; missing parents are looked up again next time
+        for parent_folder_id, folder_id in folder_ids.items():
+            if folder_id:
+                self._folder_cache[(parent_folder_id, folder_name)] = folder_id
+
+        return folder_ids
+
+    def _handle_folder_errors(self, folder_name, errors, folder_ids):
+        """Mark parents that do not exist as skipped, retry transient errors and raise any other batched error."""
+        for parent_folder_id, error in errors.items():
+            # Specific handling if parent folder doesn't exist
+            if isinstance(error, HttpError) and error.resp.status == 404:
+                logger.error(f"Parent folder not found (ID: {parent_folder_id}). Skipping this folder.")
+                folder_ids[parent_folder_id] = None
+                continue
+            # Transient failure of a single batched request: resolve this parent on its own, with backoff
+            if isinstance(error, HttpError) and error.resp.status in RETRYABLE_STATUSES:
+                logger.warning(f"Batched folder request failed for {parent_folder_id} ({error.resp.status}), retrying alone.")
+                folder_ids[parent_folder_id] = self.get_or_create_folder(folder_name, parent_folder_id)
+                continue
+            # General error logging
+            logger.error(f"Error getting/creating folder: {error}")
+            raise error
+        errors.clear()
+
     def upload_file(self, file_name, folder_id):
         """Upload a single file to Google Drive."""
         try:
             if not folder_id:
                 # Skip if folder ID is not valid
-                logging.error(f"Invalid folder ID for file {file_name}. Skipping upload.")
+                logger.error(f"Invalid folder ID for file {file_name}. Skipping upload.")
                 return None
 
             # Prepare file metadata for upload
@@ -100,45 +244,86 @@ class SavingOnDrive:
                 'parents': [folder_id]                # Upload to the specified folder
             }
 
-            # Wrap the file for upload
-            media = MediaFileUpload(file_name, resumable=True)
+            stream = None  # Raw file stream to release once the upload is done
+            if self.gzip_text_uploads and file_name.endswith(COMPRESSIBLE_SUFFIXES):
+                # Compress text outputs in memory and upload them as a .gz file
+                with open(file_name, 'rb') as f:
+                    buffer = io.BytesIO(gzip.compress(f.read()))
+                file_metadata['name'] += '.gz'
+                resumable = buffer.getbuffer().nbytes > self.resumable_threshold
+                media = MediaIoBaseUpload(buffer, mimetype='application/gzip',
+                                          chunksize=self.upload_chunk_size, resumable=resumable)
+            else:
+                # Wrap the file for upload; small files skip the resumable session initiation request
+                stream = self.open_sequential(file_name)
+                resumable = os.fstat(stream.fileno()).st_size > self.resumable_threshold
+                mimetype = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+                media = MediaIoBaseUpload(stream, mimetype=mimetype,
+                                          chunksize=self.upload_chunk_size, resumable=resumable)
 
-            # Upload the file and retrieve its ID
-            uploaded_file = self.service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id'
-            ).execute()
+            try:
+                # Upload the file and retrieve its ID
+                uploaded_file = self.execute_with_backoff(self.get_service().files().create(
+                    body=file_metadata,
+                    media_body=media,
+                    fields='id'
+                ))
+            finally:
+                if stream is not None:
+                    self.close_sequential(stream)
 
-            logging.info(f"Uploaded {file_name} to Google Drive (File ID: {uploaded_file['id']})")
+            logger.info(f"Uploaded {file_name} to Google Drive (File ID: {uploaded_file['id']})")
             return uploaded_file['id']
         except Exception as e:
             # Log any upload failure
-            logging.error(f"Error uploading {file_name}: {e}")
+            logger.error(f"Error uploading {file_name}: {e}")
             raise
 
-    def save_files(self, files):
+    def open_sequential(self, file_name):
+        """Open a file unbuffered for a single sequential read, hinting the kernel to read ahead."""
+        fd = os.open(file_name, os.O_RDONLY | getattr(os, 'O_BINARY', 0))  # O_BINARY only exists on Windows
+        if hasattr(os, 'posix_fadvise'):  # Not available on Windows
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return io.FileIO(fd, closefd=True)
+
+    def close_sequential(self, stream):
+        """Drop the uploaded file from the page cache (it is not read again) and close it."""
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(stream.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        stream.close()
+
+    def get_dated_folders(self):
+        """Retrieve or create yesterday's folder under every parent folder."""
+        # Determine yesterday's date to name subfolders
+        yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+        return self.get_or_create_folders(yesterday, self.parent_folder_ids)
+
+    def save_files(self, files, folder_ids=None):
         """Save files to Google Drive in all valid parent folders."""
         try:
-            # Determine yesterday's date to name subfolders
-            yesterday = (datetime.now() - timedelta(days=1)).strftime('%Y-%m-%d')
+            # Create or get the folder for yesterday under each parent, unless the caller resolved them
+            if folder_ids is None:
+                folder_ids = self.get_dated_folders()
 
-            # Iterate over each parent folder
+            # Collect (file, folder) pairs across all parent folders
+            uploads = []
             for parent_folder_id in self.parent_folder_ids:
-                # Create or get the folder for yesterday under each parent
-                folder_id = self.get_or_create_folder(yesterday, parent_folder_id)
+                folder_id = folder_ids.get(parent_folder_id)
 
                 if not folder_id:
                     # Skip this parent folder if subfolder creation failed
-                    logging.error(f"Skipping uploads to {parent_folder_id} because folder ID retrieval failed.")
+                    logger.error(f"Skipping uploads to {parent_folder_id} because folder ID retrieval failed.")
                     continue
 
-                # Upload all specified files into the folder
-                for file_name in files:
-                    self.upload_file(file_name, folder_id)
+                # Queue all specified files for this folder
+                uploads.extend((file_name, folder_id) for file_name in files)
+
+            # Upload all files in parallel on the long-lived pool, each thread reusing its own Drive client
+            executor = self.get_upload_executor()
+            list(executor.map(lambda upload: self.upload_file(*upload), uploads))
             
-            logging.info(f"All files uploaded successfully to valid parent folders.")
+            logger.info(f"All files uploaded successfully to valid parent folders.")
         except Exception as e:
             # Log any fatal error during the process
-            logging.error(f"Error saving files: {e}")
+            logger.error(f"Error saving files: {e}")
             raise
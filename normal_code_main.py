@@ -1,37 +1,106 @@
 # Required imports
 import asyncio
-import pandas as pd
+import csv
+import hashlib
 import os
 import json
 import logging
 import time
+from openpyxl import Workbook
 from playwright.async_api import async_playwright
 from datetime import datetime, timedelta
-from DetailsScraper import DetailsScraping  # Custom scraper class to get car details from a page
+from DetailsScraper import DetailsScraping, CHROMIUM_ARGS, THROTTLE_STATUSES  # Custom scraper class to get car details from a page
 from SavingOnDrive import SavingOnDrive  # Custom class for saving files to Google Drive
-from typing import Dict, List, Tuple
+from RateLimiter import AdaptiveRateLimiter  # Token bucket that slows down when the site pushes back
+from typing import AsyncIterator, Dict, List, Tuple
 from pathlib import Path
 from googleapiclient.errors import HttpError  # To handle Google Drive errors
 
+# Upload errors worth another attempt of the whole file (429/5xx are already retried inside SavingOnDrive)
+UPLOAD_RETRYABLE_STATUSES = {408}
+
+# Set once the root logger has been configured, so extra instances do not add duplicate handlers
+_LOGGING_CONFIGURED = False
+
+# Column order of the Excel files, matching the car dicts built by DetailsScraping
+CAR_SCHEMA = (
+    "id", "date_published", "relative_date", "pin", "type", "title", "description", "link", "image",
+    "price", "address", "additional_details", "specifications", "views_no", "submitter", "ads",
+    "membership", "phone",
+)
+
+# Rows per Excel file; larger categories are split into parts, since xlsx write time grows faster than the row count
+SEGMENT_SIZE = 50_000
+
+# 64-bit fingerprint of a listing, used to drop duplicates that show up on more than one page of a category.
+# date_published is left out: it is derived from the scrape time, so it differs between pages scraped seconds apart.
+def car_fingerprint(car: Dict) -> int:
+    key = str(car.get('id') or car.get('link'))
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+# Columns holding a list or dict (every other column is scraped as text or None)
+STRUCTURED_COLUMNS = ("additional_details", "specifications")
+
+# Positions of the structured columns in a row, converted to text before openpyxl sees them
+STRUCTURED_INDEXES = tuple(CAR_SCHEMA.index(column) for column in STRUCTURED_COLUMNS)
+
+# Builds an Excel row in schema order, writing lists/dicts as text as pandas did
+def excel_row(car: Dict) -> List:
+    row = [car.get(key) for key in CAR_SCHEMA]
+    for index in STRUCTURED_INDEXES:
+        if row[index] is not None:
+            row[index] = str(row[index])
+    return row
+
 # Main class for scraping automotive data
 class NormalMainScraper:
     def __init__(self, automotives_data: Dict[str, List[Tuple[str, int]]]):
         # Dictionary of automotive categories and their corresponding URL templates and page counts
         self.automotives_data = automotives_data
-        self.chunk_size = 2  # Number of automotive categories to process at once
-        self.max_concurrent_links = 2  # Max number of concurrent link scraping tasks
+        self.max_concurrent_pages = 5  # Max number of listing pages scraped at once across all categories
+        self.host_semaphore = asyncio.Semaphore(self.max_concurrent_pages)  # Per-host request limiter
+        self.rate_limiter = AdaptiveRateLimiter(max_rate=10, time_period=1)  # Adapts the request rate to the site
+        self.throttle_retries = 2  # Extra attempts for a page the site throttled
+        self.throttle_delay = 5  # Seconds to wait after throttling when the site sends no Retry-After
         self.logger = logging.getLogger(__name__)  # Logger for debugging/info
         self.setup_logging()  # Set up log formatting and file output
-        self.temp_dir = Path("temp_files")  # Temporary directory for storing Excel files
+        self.temp_dir = Path("temp_files")  # Temporary directory for storing the output files
         self.temp_dir.mkdir(exist_ok=True)
-        self.upload_retries = 3  # Number of times to retry upload if it fails
-        self.upload_retry_delay = 15  # Wait time between upload retries
-        self.page_delay = 3  # Delay between scraping pages to reduce server load
-        self.chunk_delay = 10  # Delay between chunks of scraping jobs
+        # Output path of each category without its extension, built once instead of per save
+        self._out_paths: Dict[str, Path] = {name: self.temp_dir / name for name in automotives_data}
+        self.not_found_ttl = 12 * 3600  # Seconds a page that returned 404 is skipped (well under the daily run interval)
+        self._not_found_file = self.temp_dir / "404.json"  # Persisted negative cache
+        self._not_found_cache: Dict[str, float] = self.load_not_found_cache()  # URL -> time of the 404
+        self.upload_retries = 3  # Upload attempts per file on a request timeout (408)
+        self.upload_retry_delay = 15  # Seconds between those attempts
+        self.output_format = os.environ.get("OUTPUT_FORMAT", "xlsx").lower()  # xlsx (default), csv or parquet
+        self.max_concurrent_uploads = 4  # Background upload workers (files uploaded to Google Drive at the same time)
+        self.upload_semaphore = asyncio.Semaphore(self.max_concurrent_uploads)  # Limits uploads in flight
+        self.credentials_dict = None  # Decoded Google service account key, parsed once per instance
         self.drive_saver = None  # Placeholder for the Google Drive saving object
+        self.context = None  # Playwright browser context shared by every page scrape during a run
+        self._dated_folder_ids = None  # Parent folder ID -> yesterday's Drive folder ID, resolved once per run
+        self._dated_folder_lock = asyncio.Lock()  # Lets only one upload worker resolve the dated folders
+        self._yesterday_prefix = self.yesterday()  # date_published prefix of the cars to keep
 
-    # Configures logging to both console and a file
+        # List of Google Drive parent folder IDs to upload into
+        self.parent_folder_ids = [
+            '1PBrE4Qfage1WgcS_rRjNpO7hW50emOaT',  # Confirmed working folder
+            '1mLRdYvZb56LS10M0hjpzYTVrQiyWGN7m'   # Folder with known upload issues
+        ]
+
+    # Returns yesterday's date as a YYYY-MM-DD string
+    @staticmethod
+    def yesterday() -> str:
+        return (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+
+    # Configures logging to both console and a file (only once per process)
     def setup_logging(self):
+        global _LOGGING_CONFIGURED
+        self.logger.setLevel(logging.INFO)
+        if _LOGGING_CONFIGURED:
+            return
+        _LOGGING_CONFIGURED = True
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(levelname)s - %(message)s',
@@ -40,128 +109,345 @@ class NormalMainScraper:
                 logging.FileHandler('scraper.log')  # Output to log file
             ]
         )
-        self.logger.setLevel(logging.INFO)
 
-    # Scrapes all pages of a specific automotive category
-    async def scrape_automotive(self, automotive_name: str, urls: List[Tuple[str, int]], semaphore: asyncio.Semaphore) -> List[Dict]:
+    # Scrapes all pages of a specific automotive category concurrently, yielding cars as soon as they are available
+    async def scrape_automotive(self, automotive_name: str, urls: List[Tuple[str, int]]) -> AsyncIterator[Dict]:
         self.logger.info(f"Starting to scrape {automotive_name}")
-        car_data = []
-        yesterday = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")  # Get yesterday's date as string
-
-        async with semaphore:  # Limit concurrency using semaphore
-            for url_template, page_count in urls:
-                for page in range(1, page_count + 1):
-                    url = url_template.format(page)  # Format URL with page number
-                    scraper = DetailsScraping(url)  # Initialize scraper
-                    try:
-                        cars = await scraper.get_car_details()  # Get list of car details from page
-                        for car in cars:
-                            if car.get("date_published", "").split()[0] == yesterday:
-                                car_data.append(car)  # Only add cars published yesterday
-                        await asyncio.sleep(self.page_delay)  # Delay before next page
-                    except Exception as e:
-                        self.logger.error(f"Error scraping {url}: {e}")  # Log and skip on error
+
+        # Every page of every URL template, fetched concurrently under the host semaphore
+        page_urls = [url_template.format(page) for url_template, page_count in urls for page in range(1, page_count + 1)]
+        tasks = [asyncio.create_task(self._fetch_page(url)) for url in page_urls]
+        seen_cars = set()  # Fingerprints of this category's cars already yielded; other categories keep their own
+
+        try:
+            # Yield each page's cars as soon as it and the pages before it are done, keeping the page order
+            for task in tasks:
+                for car in await task:
+                    # Skip listings already written, e.g. shifted onto the next page while scraping
+                    fingerprint = car_fingerprint(car)
+                    if fingerprint in seen_cars:
                         continue
+                    seen_cars.add(fingerprint)
+                    yield car
+        finally:
+            # Stop the remaining pages if the consumer gave up early
+            for task in tasks:
+                task.cancel()
+
+    # Scrapes a single listing page and keeps only the cars published yesterday
+    async def _fetch_page(self, url: str) -> List[Dict]:
+        car_data = []
+        prefix = self._yesterday_prefix
+
+        # Skip pages that recently returned 404
+        not_found_at = self._not_found_cache.get(url)
+        if not_found_at is not None and time.time() - not_found_at < self.not_found_ttl:
+            self.logger.info(f"Skipping {url}, it returned 404 recently")
+            return car_data
 
+        async with self.host_semaphore:  # Limit concurrent requests to the site
+            try:
+                status, cars = await self._scrape_page(url)  # Get list of car details from page
+                if status == 404:
+                    self._not_found_cache[url] = time.time()
+                    return car_data
+                for car in cars:
+                    date_published = car.get("date_published")
+                    if date_published and date_published.startswith(prefix):
+                        car_data.append(car)  # Only add cars published yesterday
+            except Exception as e:
+                self.logger.error(f"Error scraping {url}: {e}")  # Log and skip on error
         return car_data
 
-    # Saves list of car data into an Excel file
-    async def save_to_excel(self, automotive_name: str, car_data: List[Dict]) -> str:
-        if not car_data:
-            self.logger.info(f"No data to save for {automotive_name}, skipping Excel file creation.")
-            return None
+    # Scrapes a listing page under the rate limiter, backing off while the site throttles
+    async def _scrape_page(self, url: str) -> Tuple[int, List[Dict]]:
+        for attempt in range(self.throttle_retries + 1):
+            async with self.rate_limiter:  # Wait for a request token
+                scraper = DetailsScraping(url, context=self.context, defer_throttling=True)  # Backoff is handled below
+                cars = await scraper.get_car_details()
+
+            if scraper.status not in THROTTLE_STATUSES:
+                self.rate_limiter.on_success()
+                return scraper.status, cars
+
+            # Throttled: slow every request down and wait as long as the site asks
+            self.rate_limiter.on_throttled()
+            if attempt == self.throttle_retries:
+                self.logger.error(f"{url} still throttled ({scraper.status}) after {attempt + 1} attempts")
+                return scraper.status, cars
+            retry_after = scraper.retry_after
+            delay = int(retry_after) if retry_after and retry_after.isdigit() else self.throttle_delay
+            self.logger.warning(f"{url} throttled ({scraper.status}), retrying in {delay}s "
+                                f"at {self.rate_limiter.rate:g} requests/s")
+            await asyncio.sleep(delay)
+
+    # Loads the persisted 404 cache, dropping expired entries
+    def load_not_found_cache(self) -> Dict[str, float]:
+        try:
+            entries = json.loads(self._not_found_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(entries, dict):
+            self.logger.warning(f"Ignoring malformed 404 cache {self._not_found_file}")
+            return {}
+        now = time.time()
+        return {url: found_at for url, found_at in entries.items()
+                if isinstance(found_at, (int, float)) and now - found_at < self.not_found_ttl}
+
+    # Persists the 404 cache for the next run
+    def save_not_found_cache(self):
+        try:
+            self._not_found_file.write_text(json.dumps(self._not_found_cache), encoding="utf-8")
+        except OSError as e:
+            self.logger.error(f"Error saving 404 cache {self._not_found_file}: {e}")
+
+    # Returns the temp_dir path of a category's output file with the given suffix (e.g. ".xlsx" or "_part2.xlsx")
+    def output_path(self, automotive_name: str, suffix: str) -> Path:
+        base = self._out_paths.get(automotive_name) or self.temp_dir / automotive_name
+        return base.with_name(f"{base.name}{suffix}")
+
+    # Streams cars into Excel files as they are scraped, starting a new part every SEGMENT_SIZE rows,
+    # and returns their paths (empty if there were no cars)
+    async def save_to_excel(self, automotive_name: str, cars: AsyncIterator[Dict]) -> List[str]:
+        workbook = None
+        part = 0  # Number of the part being written
+        rows = 0  # Rows written to the current part
+        saves = []  # (path, save task) of the finished parts
+        try:
+            # Stream rows straight into a write-only workbook, no DataFrame or cell styling involved
+            async for car in cars:
+                if workbook is not None and rows == SEGMENT_SIZE:
+                    # Part is full: save it in a worker thread while the next part fills up
+                    excel_file = self.output_path(automotive_name, f"_part{part}.xlsx")
+                    saves.append((excel_file, asyncio.create_task(asyncio.to_thread(workbook.save, excel_file))))
+                    workbook = None
+                if workbook is None:
+                    # Open the workbook and write the header once the first car of the part arrives
+                    workbook = Workbook(write_only=True)
+                    worksheet = workbook.create_sheet("Sheet1")  # Same sheet name pandas used
+                    worksheet.append(CAR_SCHEMA)  # Header row
+                    part += 1
+                    rows = 0
+                worksheet.append(excel_row(car))
+                rows += 1
+
+            if workbook is None:
+                self.logger.info(f"No data to save for {automotive_name}, skipping Excel file creation.")
+                return []
+
+            # A category that fits in one part keeps its plain file name
+            excel_file = self.output_path(automotive_name, f"_part{part}.xlsx" if part > 1 else ".xlsx")
+            saves.append((excel_file, asyncio.create_task(asyncio.to_thread(workbook.save, excel_file))))
+            await asyncio.gather(*[save for _, save in saves])  # Save to Excel without blocking the event loop
+            self.logger.info(f"Successfully saved data for {automotive_name} in {part} file(s)")
+            return [str(excel_file) for excel_file, _ in saves]
+        except Exception as e:
+            self.logger.error(f"Error saving Excel files for {automotive_name}: {e}")
+            await asyncio.gather(*[save for _, save in saves], return_exceptions=True)
+            return []
 
-        excel_file = Path(f"{automotive_name}.xlsx")  # File path
+    # Streams cars into a CSV file as they are scraped and returns its path (empty if there were no cars)
+    async def save_to_csv(self, automotive_name: str, cars: AsyncIterator[Dict]) -> List[str]:
+        csv_file = self.output_path(automotive_name, ".csv")  # File path
+        file = None
         try:
-            df = pd.DataFrame(car_data)  # Convert list to DataFrame
-            df.to_excel(excel_file, index=False)  # Save to Excel
+            async for car in cars:
+                if file is None:
+                    # utf-8-sig so Excel shows the Arabic text correctly when the CSV is opened directly
+                    file = open(csv_file, "w", newline="", encoding="utf-8-sig")
+                    writer = csv.writer(file)
+                    writer.writerow(CAR_SCHEMA)  # Header row
+                writer.writerow(excel_row(car))
+
+            if file is None:
+                self.logger.info(f"No data to save for {automotive_name}, skipping CSV file creation.")
+                return []
             self.logger.info(f"Successfully saved data for {automotive_name}")
-            return str(excel_file)
+            return [str(csv_file)]
         except Exception as e:
-            self.logger.error(f"Error saving Excel file {excel_file}: {e}")
-            return None
+            self.logger.error(f"Error saving CSV file {csv_file}: {e}")
+            return []
+        finally:
+            if file is not None:
+                file.close()
 
-    # Tries uploading files to Google Drive with retries
-    def upload_files_with_retry(self, files: List[str]):
-        for file in files:
-            attempt = 0
-            while attempt < self.upload_retries:
+    # Collects the cars into columns and writes them to a zstd-compressed Parquet file (empty if there were no cars)
+    async def save_to_parquet(self, automotive_name: str, cars: AsyncIterator[Dict]) -> List[str]:
+        parquet_file = self.output_path(automotive_name, ".parquet")  # File path
+        try:
+            # Imported here so pyarrow is only needed when Parquet output is selected
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            columns = {key: [] for key in CAR_SCHEMA}
+            async for car in cars:
+                for key, value in zip(CAR_SCHEMA, excel_row(car)):
+                    columns[key].append(value)
+
+            if not columns[CAR_SCHEMA[0]]:
+                self.logger.info(f"No data to save for {automotive_name}, skipping Parquet file creation.")
+                return []
+
+            # Every column is text, so give pyarrow the type up front instead of letting it infer one
+            schema = pa.schema([(key, pa.string()) for key in CAR_SCHEMA])
+            table = pa.Table.from_pydict(columns, schema=schema)
+            await asyncio.to_thread(pq.write_table, table, parquet_file, compression="zstd")
+            self.logger.info(f"Successfully saved data for {automotive_name}")
+            return [str(parquet_file)]
+        except Exception as e:
+            self.logger.error(f"Error saving Parquet file {parquet_file}: {e}")
+            return []
+
+    # Saves a category in the configured output format and returns the written file paths
+    async def save_output(self, automotive_name: str, cars: AsyncIterator[Dict]) -> List[str]:
+        if self.output_format == "csv":
+            return await self.save_to_csv(automotive_name, cars)
+        if self.output_format == "parquet":
+            return await self.save_to_parquet(automotive_name, cars)
+        return await self.save_to_excel(automotive_name, cars)
+
+    # Tries uploading files to Google Drive with retries, without blocking the event loop,
+    # and returns the files that were uploaded
+    async def upload_files_with_retry(self, files: List[str]) -> List[str]:
+        # Use the dated Drive folders resolved for this run, resolving them now if that failed earlier.
+        # The lock stops concurrent workers from each creating the same dated folders.
+        async with self._dated_folder_lock:
+            if self._dated_folder_ids is None:
                 try:
-                    self.logger.info(f"Attempting to upload file: {file}")
-                    self.drive_saver.save_files([file])  # Upload file
-                    self.logger.info(f"File {file} uploaded successfully.")
-                    break
-                except HttpError as e:
-                    if e.resp.status == 404:
-                        self.logger.error(f"Parent folder not found for file {file}. Skipping upload.")
-                        break
-                    else:
-                        self.logger.warning(f"Upload failed for {file}, attempt {attempt + 1} of {self.upload_retries}. Error: {e}")
-                        attempt += 1
-                        time.sleep(self.upload_retry_delay)  # Wait before retry
+                    self._dated_folder_ids = await asyncio.to_thread(self.drive_saver.get_dated_folders)
                 except Exception as e:
-                    self.logger.error(f"Unexpected error while uploading {file}: {e}")
+                    self.logger.warning(f"Could not resolve Drive folders up front, resolving per file. Error: {e}")
+            folder_ids = self._dated_folder_ids
+
+        # Upload the files concurrently, each with its own retry loop
+        results = await asyncio.gather(*[self.upload_file_with_retry(file, folder_ids) for file in files])
+        return [file for file, uploaded in zip(files, results) if uploaded]
+
+    # Uploads a single file, retrying failed attempts, and returns whether it was uploaded
+    async def upload_file_with_retry(self, file: str, folder_ids: Dict[str, str] = None) -> bool:
+        attempt = 0
+        while attempt < self.upload_retries:
+            try:
+                self.logger.info(f"Attempting to upload file: {file}")
+                async with self.upload_semaphore:
+                    # The Drive client is blocking, so upload in a worker thread
+                    await asyncio.to_thread(self.drive_saver.save_files, [file], folder_ids=folder_ids)
+                self.logger.info(f"File {file} uploaded successfully.")
+                return True
+            except HttpError as e:
+                status = e.resp.status
+                if status == 404:
+                    self.logger.error(f"Parent folder not found for file {file}. Skipping upload.")
+                    break
+                if status not in UPLOAD_RETRYABLE_STATUSES:
+                    # Auth/permission errors fail the same way again; throttling was already retried with backoff
+                    self.logger.error(f"Upload of {file} failed with {status}, not retrying. Error: {e}")
                     break
-            else:
-                self.logger.error(f"Max retries reached. Could not upload {file}.")
+                self.logger.warning(f"Upload failed for {file}, attempt {attempt + 1} of {self.upload_retries}. Error: {e}")
+                attempt += 1
+                await asyncio.sleep(self.upload_retry_delay)  # Wait before retry, letting the scrapes carry on
+            except Exception as e:
+                self.logger.error(f"Unexpected error while uploading {file}: {e}")
+                break
+        else:
+            self.logger.error(f"Max retries reached. Could not upload {file}.")
+        return False
 
     # Main orchestrator function to scrape all automotives
     async def scrape_all_automotives(self):
         self.temp_dir.mkdir(exist_ok=True)
+        self._yesterday_prefix = self.yesterday()  # Refresh in case the instance outlived a day
 
         try:
-            credentials_json = os.environ.get('HIERARCHIAL_GCLOUD_KEY_JSON')  # Read credentials from env variable
-            if not credentials_json:
-                raise EnvironmentError("HIERARCHIAL_GCLOUD_KEY_JSON environment variable not found")
-            credentials_dict = json.loads(credentials_json)
-            self.drive_saver = SavingOnDrive(credentials_dict)  # Initialize Google Drive uploader
-            self.drive_saver.authenticate()  # Authenticate
+            self.setup_drive_saver()
         except Exception as e:
             self.logger.error(f"Failed to setup Google Drive: {e}")
             return
 
-        # Break data into smaller chunks
-        automotive_chunks = [
-            list(self.automotives_data.items())[i:i + self.chunk_size]
-            for i in range(0, len(self.automotives_data), self.chunk_size)
-        ]
+        # Resolve yesterday's Drive folders once for the whole run
+        self._dated_folder_ids = None
+        try:
+            self._dated_folder_ids = await asyncio.to_thread(self.drive_saver.get_dated_folders)
+        except Exception as e:
+            self.logger.warning(f"Could not resolve Drive folders, retrying at upload time. Error: {e}")
+
+        # Uploads run in background workers fed by a queue, so they overlap with the scraping
+        upload_queue: asyncio.Queue = asyncio.Queue()
+        uploaded: List[str] = []  # Files uploaded by the workers, deleted together at the end of the run
+        uploaders = [asyncio.create_task(self._uploader(upload_queue, uploaded)) for _ in range(self.max_concurrent_uploads)]
+
+        try:
+            # One browser and context for the whole run instead of a browser launch per page
+            async with async_playwright() as pw:
+                browser = await pw.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+                self.context = await browser.new_context()
+                try:
+                    # Scrape every category at once; the host semaphore is the only concurrency limit
+                    await asyncio.gather(*[
+                        self._scrape_and_queue(automotive_name, urls, upload_queue)
+                        for automotive_name, urls in self.automotives_data.items()
+                    ])
+                finally:
+                    await self.context.close()
+                    self.context = None
+                    await browser.close()
+            await upload_queue.join()  # Wait for the last uploads to finish
+        finally:
+            for uploader in uploaders:
+                uploader.cancel()
+            await asyncio.gather(*uploaders, return_exceptions=True)
+            # Delete the local files in one worker thread call instead of one per file
+            await asyncio.to_thread(self.remove_files, uploaded)
+            # Remember pages that returned 404 for the next run
+            self.save_not_found_cache()
 
-        semaphore = asyncio.Semaphore(self.max_concurrent_links)  # Limit concurrency
+    # Decodes the credentials and authenticates with Google Drive, reusing both on later runs of this instance
+    def setup_drive_saver(self):
+        if self.drive_saver is not None:
+            return  # Already authenticated; the credentials refresh their own access token when it expires
+        if self.credentials_dict is None:
+            credentials_json = os.environ.get('HIERARCHIAL_GCLOUD_KEY_JSON')  # Read credentials from env variable
+            if not credentials_json:
+                raise EnvironmentError("HIERARCHIAL_GCLOUD_KEY_JSON environment variable not found")
+            self.credentials_dict = json.loads(credentials_json)
+        drive_saver = SavingOnDrive(self.credentials_dict, parent_folder_ids=self.parent_folder_ids)  # Initialize Google Drive uploader
+        drive_saver.authenticate()  # Authenticate
+        self.drive_saver = drive_saver
 
-        for chunk_index, chunk in enumerate(automotive_chunks, 1):
-            self.logger.info(f"Processing chunk {chunk_index}/{len(automotive_chunks)}")
+    # Scrapes a category, saves it in the output format and queues the files for upload
+    async def _scrape_and_queue(self, automotive_name: str, urls: List[Tuple[str, int]], upload_queue: asyncio.Queue):
+        try:
+            # Write the cars out while the category is still being scraped
+            cars = self.scrape_automotive(automotive_name, urls)
+            try:
+                output_files = await self.save_output(automotive_name, cars)
+            finally:
+                await cars.aclose()  # Cancel pages still running if saving stopped early
+            for output_file in output_files:
+                await upload_queue.put(output_file)  # Parts are uploaded in parallel by the upload workers
+        except Exception as e:
+            self.logger.error(f"Error processing {automotive_name}: {e}")
 
-            tasks = []
-            for automotive_name, urls in chunk:
-                task = asyncio.create_task(self.scrape_automotive(automotive_name, urls, semaphore))  # Create async task
-                tasks.append((automotive_name, task))
-                await asyncio.sleep(2)  # Stagger task start slightly
+    # Background worker: uploads queued files without blocking the event loop and records them for cleanup
+    async def _uploader(self, upload_queue: asyncio.Queue, uploaded: List[str]):
+        while True:
+            file = await upload_queue.get()
+            try:
+                # Files that failed to upload stay on disk
+                uploaded.extend(await self.upload_files_with_retry([file]))
+            except Exception as e:
+                self.logger.error(f"Error uploading {file}: {e}")
+            finally:
+                upload_queue.task_done()
 
-            pending_uploads = []
-            for automotive_name, task in tasks:
-                try:
-                    car_data = await task  # Wait for scrape result
-                    if car_data:
-                        excel_file = await self.save_to_excel(automotive_name, car_data)  # Save if non-empty
-                        if excel_file:
-                            pending_uploads.append(excel_file)
-                except Exception as e:
-                    self.logger.error(f"Error processing {automotive_name}: {e}")
-
-            # Upload and clean up
-            if pending_uploads:
-                self.upload_files_with_retry(pending_uploads)
-                for file in pending_uploads:
-                    try:
-                        os.remove(file)  # Delete local file
-                        self.logger.info(f"Cleaned up local file: {file}")
-                    except Exception as e:
-                        self.logger.error(f"Error cleaning up {file}: {e}")
-
-            # Wait before next chunk
-            if chunk_index < len(automotive_chunks):
-                self.logger.info(f"Waiting {self.chunk_delay} seconds before next chunk...")
-                await asyncio.sleep(self.chunk_delay)
+    # Deletes local files, carrying on past any that cannot be removed
+    def remove_files(self, files: List[str]):
+        for file in files:
+            try:
+                os.unlink(file)  # Delete local file
+                self.logger.info(f"Cleaned up local file: {file}")
+            except OSError as e:
+                self.logger.error(f"Error cleaning up {file}: {e}")
 
 # Sample data to scrape: category -> (URL template, number of pages)
 if __name__ == "__main__":
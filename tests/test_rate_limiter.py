@@ -0,0 +1,38 @@
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from RateLimiter import AdaptiveRateLimiter
+
+
+class AdaptiveRateLimiterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_acquire_below_one_request_per_period(self):
+        limiter = AdaptiveRateLimiter(max_rate=10, time_period=0.1, min_rate=0.5)
+        for _ in range(4):
+            limiter.on_throttled()  # 10 -> 5 -> 2.5 -> 1.25 -> 0.625
+        self.assertLess(limiter.rate, 1)
+
+        # A token refills after time_period / rate (0.16s); it must not wait forever
+        await asyncio.wait_for(limiter.acquire(), timeout=2)
+        await asyncio.wait_for(limiter.acquire(), timeout=2)
+
+    async def test_throttling_stops_at_min_rate(self):
+        limiter = AdaptiveRateLimiter(max_rate=10, min_rate=0.5)
+        for _ in range(10):
+            limiter.on_throttled()
+        self.assertEqual(limiter.rate, 0.5)
+        self.assertEqual(limiter.capacity, 1)
+
+    async def test_success_grows_rate_back_to_max(self):
+        limiter = AdaptiveRateLimiter(max_rate=3)
+        limiter.on_throttled()
+        for _ in range(5):
+            limiter.on_success()
+        self.assertEqual(limiter.rate, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()